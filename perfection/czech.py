@@ -5,8 +5,17 @@ Use the Czech et al. method for generating minimal perfect hashes for strings.
 
 from __future__ import print_function
 
+import sys
 import random
 import collections
+from operator import mul
+
+try:
+    # Python 2.7: the built-in map() pads the shorter input with None.
+    from itertools import imap as map
+except ImportError:
+    # Python 3.x
+    pass
 
 from . import forest
 from .utils import create_dict_subclass
@@ -35,11 +44,12 @@ class CzechHashBuilder(object):
     """
 
     def __init__(self, words, minimize=False):
-        # Store the words as an immutable sequence.
-        self.words = ordered_deduplicate(words)
+        # Store the words as an immutable sequence, along with the character
+        # codes of each word, computed once for all trials.
+        self.words, self.word_codes, max_len = prepare_words(words)
 
         # TODO: Index minimization
-        self.indices = list(range(len(words[0])))
+        self.indices = list(range(max_len))
 
         # Each of the following steps add fields to `self`:
 
@@ -80,7 +90,11 @@ class CzechHashBuilder(object):
             v2 = f2(word)
             return g[v1] + g[v2]
 
-        return czech_hash
+        # Words of the lengths in the input get a specialized hash function;
+        # the generic one above is still used for any other length.
+        lengths = set(map(len, self.word_codes))
+        return specialize_hash(lengths, self.t1, self.t2, g, self.n,
+                               len(self.words), czech_hash)
 
     # Algorithm steps.
 
@@ -113,11 +127,21 @@ class CzechHashBuilder(object):
 
     def generate_random_table(self):
         """
-        Generates random tables for given word lists.
+        Generates the start of a random table for given word lists: only the
+        entries needed to map the longest word. Most trials fail, so the rest
+        of the table is only drawn by complete_table() once a trial succeeds.
         """
-        table = list(range(0, self.n))
-        random.shuffle(table)
-        return table
+        return random.sample(range(self.n), min(len(self.indices), self.n))
+
+    def complete_table(self, table):
+        """
+        Extends a table from generate_random_table() to a random permutation
+        of range(n).
+        """
+        used = set(table)
+        rest = [x for x in range(self.n) if x not in used]
+        random.shuffle(rest)
+        return table + rest
 
     def generate_or_fail(self):
         """
@@ -127,24 +151,42 @@ class CzechHashBuilder(object):
 
         t1 = self.generate_random_table()
         t2 = self.generate_random_table()
-        f1 = self.generate_func(t1)
-        f2 = self.generate_func(t2)
-        edges = [(f1(word), f2(word)) for word in self.words]
+        edges = self.generate_edges(t1, t2)
+
+        # Loops and duplicate edges are the most common reasons for a trial
+        # to fail; both are much cheaper to detect than building the graph.
+        if any(u == v for u, v in edges):
+            raise forest.InvariantError('Generated a loop')
+        unique_edges = {(u, v) if u < v else (v, u) for u, v in edges}
+        if len(unique_edges) != len(edges):
+            raise forest.InvariantError('Generated a duplicate edge')
 
         # Try to generate that graph, mack!
         # Note that failure to generate the graph here should be caught
         # by the caller.
-        graph = forest.ForestGraph(edges=edges)
+        graph = forest.ForestGraph.from_edges_bulk(edges)
+
+        t1 = self.complete_table(t1)
+        t2 = self.complete_table(t2)
+        f1 = self.generate_func(t1)
+        f2 = self.generate_func(t2)
 
         # Associate each edge with its corresponding word.
         associations = {}
-        for num in range(len(self.words)):
-            edge = edges[num]
-            word = self.words[num]
-            associations[graph.canonical_order(edge)] = (num, word)
+        for num, (u, v) in enumerate(edges):
+            edge = (u, v) if u < v else (v, u)
+            associations[edge] = (num, self.words[num])
+
+        # Number each edge in both directions, so that the assignment step
+        # can look up an edge in whichever direction it walks it.
+        numbers = range(len(edges))
+        sources, targets = zip(*edges)
+        edge_numbers = dict(zip(edges, numbers))
+        edge_numbers.update(zip(zip(targets, sources), numbers))
 
         # Assign all of these to the object.
-        for name in ('t1', 't2', 'f1', 'f2', 'graph', 'associations'):
+        for name in ('t1', 't2', 'f1', 'f2', 'graph', 'associations',
+                     'edge_numbers'):
             self.__dict__[name] = locals()[name]
 
     def generate_func(self, table):
@@ -155,40 +197,136 @@ class CzechHashBuilder(object):
         # Ensure that `self` isn't suddenly in the closure...
         n = self.n
 
+        # Like zip(), map() stops at the shorter of the table and the word,
+        # but the whole sum is computed without running any bytecode.
         def func(word):
-            return sum(x * ord(c) for x, c in zip(table, word)) % n
+            return sum(map(mul, table, map(ord, word))) % n
 
         return func
 
+    def generate_edges(self, t1, t2):
+        """
+        Returns the edge of every word: the pair of vertices it maps to using
+        either table. Equivalent to calling the functions generated for t1 and
+        t2 on each word, in a single pass and without a call per word.
+        """
+        n = self.n
+        return [(sum(map(mul, t1, codes)) % n, sum(map(mul, t2, codes)) % n)
+                for codes in self.word_codes]
+
     def assign(self):
-        # Create an vector of empty assignments.
+        # Create a flat vector of assignments. Vertices that are not in the
+        # graph are never looked up, so they are simply left as 0. A list
+        # keeps g unbounded, and it is what gets exported.
         # **g is 1-indexed!**
-        self.g = [None] * (self.n + 1)
-
-        # Assign all vertices.
-        for vertex in self.graph.vertices:
-            assert isinstance(vertex, int) and vertex <= self.n
+        self.g = g = [0] * (self.n + 1)
+        # Flags which vertices have been assigned so far.
+        assigned = bytearray(self.n + 1)
+        neighbours = self.graph.neighbours
+        edge_numbers = self.edge_numbers
+
+        # Assign all vertices, one tree at a time.
+        for root in self.graph.vertices:
+            assert isinstance(root, int) and root <= self.n
             # This vertex has already been assigned.
-            if self.g[vertex] is not None:
+            if assigned[root]:
                 continue
 
-            self.g[vertex] = 0
-            self.assign_vertex(vertex)
+            # g[root] is already 0.
+            assigned[root] = 1
+
+            # Walk the tree with an explicit stack; recursing would exceed
+            # Python's recursion limit on long paths through the graph.
+            stack = [root]
+            while stack:
+                vertex = stack.pop()
+                g_vertex = g[vertex]
+                for neighbour in neighbours(vertex):
+                    if assigned[neighbour]:
+                        # This neighbour has already been assigned.
+                        continue
+
+                    # Assign this vertex such that
+                    # h(word) == g(vertex) + g(neighbour)
+                    g[neighbour] = edge_numbers[vertex, neighbour] - g_vertex
+                    assigned[neighbour] = 1
+                    stack.append(neighbour)
 
-    def assign_vertex(self, vertex):
-        for neighbour in self.graph.neighbours(vertex):
-            if self.g[neighbour] is not None:
-                # This neighbour has already been assigned.
-                continue
 
-            # Get the associated edge number
-            edge = self.graph.canonical_order((vertex, neighbour))
-            num, _word = self.associations[edge]
+# Longer words are hashed by the generic function: the unrolled sum grows
+# with the word, and CPython cannot compile one a few thousand terms long.
+_MAX_SPECIALIZED_LENGTH = 64
 
-            # Assign this vertex such that
-            # h(word) == g(vertex) + g(neighbour)
-            self.g[neighbour] = num - self.g[vertex]
-            self.assign_vertex(neighbour)
+_specialized_hash_tmpl = '''
+def czech_hash_{length}(word):
+    {codes}, = map(ord, word)
+    return g[({sum1}) % {n}] + g[({sum2}) % {n}]
+'''
+
+
+def specialize_hash(lengths, t1, t2, g, n, size, fallback):
+    """
+    Returns a Czech hash function that compiles a dedicated function for
+    each of the given word lengths up to _MAX_SPECIALIZED_LENGTH, with the
+    loop over the tables unrolled and the table entries inlined as
+    constants. Words of any other length are hashed by fallback().
+
+    Only hash values in range(size) are returned; a word that hashes to
+    anything else cannot be one of the hashed words, so it raises KeyError.
+
+    >>> g = [0, 10, 20]
+    >>> hf = specialize_hash({2}, [3, 1, 2], [1, 3, 2], g, 3, 50,
+    ...                      lambda w: 10 * len(w))
+    >>> hf('ab') == g[(3 * 97 + 1 * 98) % 3] + g[(1 * 97 + 3 * 98) % 3]
+    True
+    >>> hf('abc')
+    30
+    >>> hf('abcdefgh')
+    Traceback (most recent call last):
+    ...
+    KeyError: 'abcdefgh'
+    """
+    namespace = {'g': g}
+    specialized = {}
+
+    for length in lengths:
+        # The generic hash ignores characters past the end of the tables.
+        if not 0 < length <= min(n, _MAX_SPECIALIZED_LENGTH):
+            continue
+
+        indices = range(length)
+        source = _specialized_hash_tmpl.format(
+            length=length,
+            codes=', '.join('c%d' % i for i in indices),
+            sum1=' + '.join('%d*c%d' % (t1[i], i) for i in indices),
+            sum2=' + '.join('%d*c%d' % (t2[i], i) for i in indices),
+            n=n)
+        exec(compile(source, '<czech_hash_%d>' % length, 'exec'), namespace)
+        specialized[length] = namespace['czech_hash_%d' % length]
+
+    get_specialized = specialized.get
+
+    def czech_hash(word):
+        value = get_specialized(len(word), fallback)(word)
+        if 0 <= value < size:
+            return value
+        raise KeyError(word)
+
+    return czech_hash
+
+
+def prepare_words(words):
+    """
+    Returns the words as a deduplicated tuple, the character codes of each
+    word, and the length of the longest word.
+
+    >>> prepare_words(['ab', 'c', 'ab'])
+    (('ab', 'c'), ((97, 98), (99,)), 2)
+    """
+    unique_words = ordered_deduplicate(words)
+    codes = tuple(tuple(map(ord, word)) for word in unique_words)
+    max_len = max(map(len, codes)) if codes else 0
+    return unique_words, codes, max_len
 
 
 def ordered_deduplicate(sequence):
@@ -204,6 +342,11 @@ def ordered_deduplicate(sequence):
     http://stackoverflow.com/a/480227
     """
 
+    # Python 3.7+ dicts preserve insertion order, and fromkeys() does the
+    # whole job in C.
+    if sys.version_info >= (3, 7):
+        return tuple(dict.fromkeys(sequence))
+
     seen = set()
     # Micro optimization: each call to seen_add saves an extra attribute
     # lookup in most iterations of the loop.
@@ -226,9 +369,6 @@ def hash_parameters(words, minimize_indices=False):
     >>> len(info.g) # g values are 1-indexed...
     22
     """
-    # Ensure that we have an indexable sequence.
-    words = tuple(words)
-
     # Delegate to the hash builder.
     return CzechHashBuilder(words).hash_info
 
@@ -261,7 +401,7 @@ class PickableHash:
         self.t2 = hb.t2
 
     def __mini_hashing(self, word, table):
-        return sum(x * ord(c) for x, c in zip(table, word)) % self.n
+        return sum(map(mul, table, map(ord, word))) % self.n
 
     def czech_hash(self, word):
         v1 = self.__mini_hashing(word, self.t1)
@@ -295,6 +435,9 @@ def make_dict(name, words, *args, **kwargs):
     This mapping subclass has guaranteed O(1) worst-case lookups, additions,
     and deletions, however is slower than dict() in practice.
 
+    If the keyword argument `typecode` is given, values are stored in an
+    array.array of that typecode instead of a list.
+
     >>> months = 'jan feb mar apr may jun jul aug sep oct nov dec'.split()
     >>> MyDict = make_dict('MyDict', months)
     >>> d = MyDict(dec=21, feb=None, may='hello')
@@ -310,6 +453,7 @@ def make_dict(name, words, *args, **kwargs):
     3
     """
 
+    typecode = kwargs.pop('typecode', None)
     info = CzechHashBuilder(words, *args, **kwargs)
 
     # Create a docstring that at least describes where the class came from...
@@ -319,7 +463,8 @@ def make_dict(name, words, *args, **kwargs):
         """ % (__name__, make_dict.__name__, name)
 
     # Delegate to create_dict.
-    return create_dict_subclass(name, info.hash_function, info.words, doc)
+    return create_dict_subclass(name, info.hash_function, info.words, doc,
+                                typecode)
 
 
 def to_hash_info(unknown):
@@ -338,7 +483,7 @@ def do_example():
     print('/*', hb.t1, hb.t2, hb.g, '*/')
     print(hb.graph.to_dot(edge_labels={
         edge: '%d: %s' % assoc for edge, assoc in list(hb.associations.items())
-        }))
+        }, sort_edges=True))
 
 
 if __name__ == '__main__':
@@ -25,7 +25,7 @@ class ForestGraph(object):
     True
     >>> 5 in graph.vertices
     False
-    >>> print(graph.to_dot())
+    >>> print(graph.to_dot(sort_edges=True))
     graph {
         "1" -- "2";
         "2" -- "3";
@@ -41,19 +41,87 @@ class ForestGraph(object):
 
     def __init__(self, vertices=(), edges=()):
         # Each vertex is associated with a list of its neighbouring vertices.
-        self._vertices = collections.defaultdict(set)
-
-        # Each edge *may* be associated with an arbitrary value.
-        self._edges = {}
-
-        # Components is a dictionary of vertex -> to the set of all vertices
-        # that comprise that component. Note that all vertex of the same
-        # component share the exactly the SAME set instance!
-        self.components = {}
+        # A list suffices: a repeated edge would form a cycle, so it is
+        # rejected before it can be added twice.
+        self._vertices = collections.defaultdict(list)
+
+        # The set of all edges, in canonical order, and a read-only copy of
+        # it for the edges property, made on demand; adding an edge resets
+        # the copy to None.
+        self._edges = set()
+        self._edges_cache = None
+
+        # The connected components are kept in a disjoint-set forest: each
+        # vertex points to a parent in the same component, and the root
+        # vertex identifies the component. The rank of a root bounds the
+        # height of its tree.
+        self._parent = {}
+        self._rank = {}
+
+        # The vertex -> component mapping, built on demand by the components
+        # property. Anything that changes the components resets it to None.
+        self._components = None
 
         for edge in edges:
             self.add_edge(edge)
 
+    @classmethod
+    def from_edges_bulk(cls, edges):
+        """
+        Builds a graph from the given edges in one pass. Equivalent to
+        ForestGraph(edges=edges), but much faster for large graphs.
+
+        >>> graph = ForestGraph.from_edges_bulk([(1, 2), (3, 2), (3, 4)])
+        >>> sorted(graph.edges)
+        [(1, 2), (2, 3), (3, 4)]
+        >>> components = graph.components
+        >>> components[1] is components[4]
+        True
+        """
+        graph = cls()
+        adjacency = graph._vertices
+        edge_set = graph._edges
+        parent = graph._parent
+        rank = graph._rank
+
+        # This is add_edge() and _find() inlined, with all attributes bound
+        # to locals. The graph is new, so it has no cached components or
+        # edges to reset.
+        for edge in edges:
+            u, v = edge
+            if u == v:
+                raise InvariantError('Cannot add loop: %r' % (edge,))
+
+            if u not in parent:
+                parent[u] = u
+                rank[u] = 0
+            if v not in parent:
+                parent[v] = v
+                rank[v] = 0
+
+            root_u = u
+            while parent[root_u] != root_u:
+                parent[root_u] = parent[parent[root_u]]
+                root_u = parent[root_u]
+            root_v = v
+            while parent[root_v] != root_v:
+                parent[root_v] = parent[parent[root_v]]
+                root_v = parent[root_v]
+            if root_u == root_v:
+                raise InvariantError('Adding %r would form a cycle' % (edge,))
+
+            adjacency[u].append(v)
+            adjacency[v].append(u)
+            edge_set.add((u, v) if u < v else (v, u))
+
+            if rank[root_u] < rank[root_v]:
+                root_u, root_v = root_v, root_u
+            parent[root_v] = root_u
+            if rank[root_u] == rank[root_v]:
+                rank[root_u] += 1
+
+        return graph
+
     def __iadd__(self, edge):
         self.add_edge(edge)
         return self
@@ -65,52 +133,111 @@ class ForestGraph(object):
         """
         u, v = edge
 
-        both_exist = u in self.vertices and v in self.vertices
-        # Using `is` because if they belong to the same component, they MUST
-        # share the same set object!
-        if both_exist and self.components[u] is self.components[v]:
-            # Both vertices are part of the same connected component.
-            raise InvariantError('Adding %r would form a cycle' % (edge,))
         if u == v:
             raise InvariantError('Cannot add loop: %r' % (edge,))
 
-        # Ensure the vertices exist in the graph.
-        self.add_vertex(u)
-        self.add_vertex(v)
+        # Ensure the vertices exist in the graph. This is add_vertex()
+        # inlined, as it is done twice for every edge.
+        parent = self._parent
+        if u not in parent:
+            parent[u] = u
+            self._rank[u] = 0
+        if v not in parent:
+            parent[v] = v
+            self._rank[v] = 0
+
+        root_u = self._find(u)
+        root_v = self._find(v)
+        if root_u == root_v:
+            # Both vertices are part of the same connected component.
+            raise InvariantError('Adding %r would form a cycle' % (edge,))
 
         # Add the edges to each other.
-        self._vertices[u].add(v)
-        self._vertices[v].add(u)
-
-        # Add all of the smaller components to the bigger one.
-        smaller_component, bigger_component = self.sort_components(u, v)
-        for vertex in smaller_component:
-            bigger_component.add(vertex)
-            # And with this assignment, say bye-bye to the smaller component.
-            self.components[vertex] = bigger_component
-
-    def sort_components(self, u, v):
-        return sorted((self.components[u], self.components[v]), key=len)
+        self._vertices[u].append(v)
+        self._vertices[v].append(u)
+        # Canonicalize the edge here, once, so it never has to be at read time.
+        self._edges.add((u, v) if u < v else (v, u))
+        self._edges_cache = None
+
+        # Merge the components by linking the shallower tree under the root
+        # of the deeper one.
+        rank = self._rank
+        if rank[root_u] < rank[root_v]:
+            root_u, root_v = root_v, root_u
+        parent[root_v] = root_u
+        if rank[root_u] == rank[root_v]:
+            rank[root_u] += 1
+        self._components = None
+
+    def _find(self, vertex):
+        """
+        Returns the root vertex of the vertex's component.
+        """
+        parent = self._parent
+        while parent[vertex] != vertex:
+            # Path halving: point every other vertex on the path to its
+            # grandparent, so that later finds are shorter.
+            parent[vertex] = parent[parent[vertex]]
+            vertex = parent[vertex]
+        return vertex
 
     def add_vertex(self, vertex):
         # Make a new component for the vertex, if the vertex doesn't exist
         # yet.
-        self.components.setdefault(vertex, {vertex})
+        if vertex not in self._parent:
+            self._parent[vertex] = vertex
+            self._rank[vertex] = 0
+            self._components = None
+
+    @property
+    def components(self):
+        """
+        Dictionary of vertex -> to the set of all vertices that comprise that
+        component. Note that all vertices of the same component share exactly
+        the SAME set instance! The dictionary is cached until the graph
+        changes, so it must not be modified.
+
+        >>> graph = ForestGraph(edges=[(1, 2), (3, 4)])
+        >>> graph.components[1] is graph.components[2]
+        True
+        >>> graph.components[1] is graph.components[3]
+        False
+        >>> graph += (2, 3)
+        >>> graph.components[1] is graph.components[4]
+        True
+        """
+        if self._components is None:
+            roots = {vertex: self._find(vertex) for vertex in self._parent}
+            members = collections.defaultdict(set)
+            for vertex, root in roots.items():
+                members[root].add(vertex)
+            self._components = {vertex: members[root]
+                                for vertex, root in roots.items()}
+        return self._components
 
     def to_dot(self, *args, **kwargs):
-        return graph_as_dot(self.edges, *args, **kwargs)
+        return graph_as_dot(self._edges, *args, **kwargs)
 
     @property
     def edges(self):
         """
-        Edges of this graph, in canonical order.
+        Set of all edges of this graph, in canonical order. This is a
+        read-only copy, shared between accesses until an edge is added.
+
+        >>> graph = ForestGraph(edges=[(2, 1)])
+        >>> graph.edges == {(1, 2)}
+        True
+        >>> isinstance(graph.edges, frozenset)
+        True
+        >>> graph.edges is graph.edges
+        True
+        >>> graph += (2, 3)
+        >>> graph.edges == {(1, 2), (2, 3)}
+        True
         """
-        canonical_edges = set()
-        for v1, neighbours in self._vertices.items():
-            for v2 in neighbours:
-                edge = self.canonical_order((v1, v2))
-                canonical_edges.add(edge)
-        return canonical_edges
+        if self._edges_cache is None:
+            self._edges_cache = frozenset(self._edges)
+        return self._edges_cache
 
     @property
     def vertices(self):
@@ -130,39 +257,52 @@ class ForestGraph(object):
         return edge if u < v else (v, u)
 
     def __repr__(self):
-        cls_name = type(self).__name__
-        args = ', '.join(getattr(self, attr) for attr in ('vertices', 'edges'))
-        return ''.join((cls_name, '(', args, ')'))
+        """
+        Summarizes the size of the graph, without listing its contents.
 
+        >>> ForestGraph(edges=[(1, 2), (2, 3)])
+        ForestGraph(vertices=3, edges=2)
+        """
+        return '%s(vertices=%d, edges=%d)' % (type(self).__name__,
+                                              len(self._vertices),
+                                              len(self._edges))
 
-def graph_as_dot(edge_set, edge_labels=None, indentation=4):
+
+def graph_as_dot(edge_set, edge_labels=None, indentation=4,
+                 sort_edges=False):
+    """
+    Returns the edges as a graph in the dot language. Edges are output in
+    the set's iteration order, unless sort_edges is true.
+    """
     if not edge_labels:
         edge_labels = {}
 
     indent = ' ' * indentation
-    edge_tmpl = indent + '"{u}" -- "{v}"{label};'
 
     def sanitize(vertex):
         return '"%s"' % str(vertex).replace('"', r'\"')
 
-    def make_label(edge):
-        if edge not in edge_labels:
-            return ""
+    # Most vertices are in several edges; sanitize each of them only once.
+    sanitized = {}
 
-        text = edge_labels[edge]
-        return "[label=%s]" % sanitize(text)
-
-    def yield_lines():
-        yield 'graph {'
+    lines = ['graph {']
+    for edge in sorted(edge_set) if sort_edges else edge_set:
+        u, v = edge
+        if u not in sanitized:
+            sanitized[u] = sanitize(u)
+        if v not in sanitized:
+            sanitized[v] = sanitize(v)
 
-        for edge in sorted(edge_set):
-            u, v = edge
-            label = make_label(edge)
-            yield edge_tmpl.format(**vars())
+        if edge in edge_labels:
+            label = "[label=%s]" % sanitize(edge_labels[edge])
+        else:
+            label = ""
 
-        yield '}'
+        lines.append('%s%s -- %s%s;' % (indent, sanitized[u], sanitized[v],
+                                        label))
+    lines.append('}')
 
-    return '\n'.join(yield_lines())
+    return '\n'.join(lines)
 
 
 def print_example_graph():
@@ -170,7 +310,7 @@ def print_example_graph():
     for c in 'uvwxy':
         l[c] = c
     g = ForestGraph(edges=[(u, w), (w, x), (v,y)])
-    print(g.to_dot())
+    print(g.to_dot(sort_edges=True))
 
 if __name__ == '__main__':
     import sys
@@ -5,7 +5,6 @@ from __future__ import print_function, division
 
 import math
 import collections
-import heapq
 
 from .utils import create_dict_subclass
 
@@ -71,27 +70,29 @@ def hash_parameters(keys, minimize=True, to_int=None):
 
     key_to_original = {to_int(original): original for original in keys}
 
-    # Create a set of all items to be hashed.
-    items = list(key_to_original.keys())
+    # Create a list of all items to be hashed; they are already unique.
+    items = list(key_to_original)
+    max_item = max(items)
 
     if minimize:
         offset = 0 - min(items)
-        items = frozenset(x + offset for x in items)
+        items = [x + offset for x in items]
+        max_item += offset
     else:
         offset = 0
 
     # 1. Start with a square array (not stored) that is t units on each side.
     # Choose a t such that t * t >= max(S)
-    t = choose_best_t(items)
-    assert t * t > max(items) and t * t >= len(items)
+    t = choose_best_t(max_item, len(items))
+    assert t * t > max_item and t * t >= len(items)
 
     # 2. Place each key K in the square at location (x,y), where
     # x = K mod t, y = K / t.
-    row_queue = place_items_in_square(items, t)
+    rows = place_items_in_square(items, t)
 
     # 3. Arrange rows so that they'll fit into one row and generate a
     # displacement vector.
-    final_row, displacement_vector = arrange_rows(row_queue, t)
+    final_row, displacement_vector = arrange_rows(rows, t)
 
     # Translate the internal keys to their original items.
     slots = tuple(key_to_original[item - offset] if item is not None else None
@@ -107,68 +108,58 @@ def hash_parameters(keys, minimize=True, to_int=None):
     )
 
 
-def choose_best_t(items):
-    minimum_allowable = int(math.sqrt(max(items)) + 1)
-    if minimum_allowable ** 2 < len(items):
-        return len(items)
+def choose_best_t(max_item, num_items):
+    minimum_allowable = int(math.sqrt(max_item) + 1)
+    if minimum_allowable ** 2 < num_items:
+        return num_items
     else:
         return minimum_allowable
 
 
 def place_items_in_square(items, t):
     """
-    Returns a list of rows that are stored as a priority queue to be
-    used with heapq functions.
+    Returns a list of the populated rows of the square, longest row first.
+    Each row is a tuple of (t - |row|, y, bits, [(xpos_1, item_1), ...]),
+    where bit x of bits is set when column x of the row is occupied.
 
     >>> place_items_in_square([1,5,7], 4)
-    [(2, 1, [(1, 5), (3, 7)]), (3, 0, [(1, 1)])]
+    [(2, 1, 10, [(1, 5), (3, 7)]), (3, 0, 2, [(1, 1)])]
     >>> place_items_in_square([1,5,7], 3)
-    [(2, 0, [(1, 1)]), (2, 1, [(2, 5)]), (2, 2, [(1, 7)])]
+    [(2, 0, 2, [(1, 1)]), (2, 1, 4, [(2, 5)]), (2, 2, 2, [(1, 7)])]
     """
 
-    # A minheap (because that's all that heapq supports :/)
-    # of the length of each row. Why this is important is because
-    # we'll be popping the largest rows when figuring out row displacements.
-    # Each item is a tuple of (t - |row|, y, [(xpos_1, item_1), ...]).
-    # Until the call to heapq.heapify(), the rows are ordered in
-    # increasing row number (y).
-    rows = [(t, y, []) for y in range(t)]
+    row_bits = [0] * t
+    row_contents = [[] for _ in range(t)]
 
     for item in items:
         # Calculate the cell the item should fall in.
-        x = item % t
-        y = item // t
+        y, x = divmod(item, t)
 
-        # Push the item to its corresponding row...
-        inverse_length, _, row_contents = rows[y]
-        heapq.heappush(row_contents, (x, item))
+        row_bits[y] |= 1 << x
+        row_contents[y].append((x, item))
 
-        # Ensure the heap key is kept intact.
-        rows[y] = inverse_length - 1, y, row_contents
+    # Sort the populated rows once, such that the largest rows are placed
+    # first when figuring out row displacements; ties go to the lowest
+    # row number (y).
+    return sorted((t - len(row), y, row_bits[y], row)
+                  for y, row in enumerate(row_contents) if row)
 
-    assert all(inv_len == t - len(rows) for inv_len, _, rows in rows)
 
-    heapq.heapify(rows)
-
-    # Return only rows that are populated.
-    return [row for row in rows if row[2]]
-
-
-def arrange_rows(row_queue, t):
+def arrange_rows(rows, t):
     """
-    Takes a priority queue as generated by place_items_in_square().
-    Arranges the items from its conceptual square to one list.  Returns
-    both the resultant vector, plus the displacement vector, to be used
-    in the final output hash function.
+    Takes the rows as generated by place_items_in_square() and arranges
+    the items from its conceptual square to one list, in the order given.
+    Returns both the resultant vector, plus the displacement vector, to be
+    used in the final output hash function.
 
-    >>> rows = [(2, 1, [(0, 1), (1, 5)]), (3, 3, [(1, 7)])]
+    >>> rows = [(2, 1, 0b11, [(0, 1), (1, 5)]), (3, 3, 0b10, [(1, 7)])]
     >>> result, displacements = arrange_rows(rows, 4)
     >>> result
     (1, 5, 7)
     >>> displacements
     (None, 0, None, 1)
 
-    >>> rows = [(1, 1, [(0, 1), (2, 7)]), (2, 2, [(1, 5)])]
+    >>> rows = [(1, 1, 0b101, [(0, 1), (2, 7)]), (2, 2, 0b10, [(1, 5)])]
     >>> result, displacements = arrange_rows(rows, 3)
     >>> result
     (1, 5, 7)
@@ -176,79 +167,81 @@ def arrange_rows(row_queue, t):
     (None, 0, 0)
     """
 
-    # Create a set of all of the unoccupied columns.
+    # Bitmap of all of the unoccupied columns, split into blocks of t
+    # columns: bit x of free_blocks[i] is set when column i * t + x of the
+    # result is still free. A row is at most t columns wide, so a row
+    # starting in block i only ever touches blocks i and i + 1. The last
+    # block is an always-full sentinel past the end of the result.
     max_columns = t ** 2
-    cols = ((x, True) for x in range(max_columns))
-    unoccupied_columns = collections.OrderedDict(cols)
+    block_mask = (1 << t) - 1
+    free_blocks = [block_mask] * t + [0]
+    first_free_block = 0
 
     # Create the resultant and displacement vectors.
     result = [None] * max_columns
     displacements = [None] * t
 
-    while row_queue:
-        # Get the next row to place.
-        _inverse_length, y, row = heapq.heappop(row_queue)
+    for _inverse_length, y, bits, row in rows:
+        # Shift the row such that its first item is bit 0.
+        first_item_x = (bits & -bits).bit_length() - 1
+        row_mask = bits >> first_item_x
 
-        offset = find_first_fit(unoccupied_columns, row, max_columns)
-        # Calculate the offset of the first item.
-        first_item_x = row[0][0]
+        # Full blocks at the start will never fit anything again.
+        while not free_blocks[first_free_block]:
+            first_free_block += 1
+
+        column = find_first_fit(free_blocks, row_mask, t, first_free_block)
+        # The offset is that such that the first item goes in the free column.
+        offset = column - first_item_x
 
         displacements[y] = offset
+        block, block_x = divmod(column, t)
+        placed = row_mask << block_x
+        free_blocks[block] &= ~placed
+        free_blocks[block + 1] &= ~(placed >> t)
         for x, item in row:
-            actual_x = x + offset
-            result[actual_x] = item
-            del unoccupied_columns[actual_x]
+            result[x + offset] = item
 
     return tuple(trim_nones_from_right(result)), tuple(displacements)
 
 
-def find_first_fit(unoccupied_columns, row, row_length):
+def find_first_fit(free_blocks, row_mask, block_size, start=0):
     """
-    Finds the first index that the row's items can fit.
-    """
-    for free_col in unoccupied_columns:
-        # The offset is that such that the first item goes in the free column.
-        first_item_x = row[0][0]
-        offset = free_col - first_item_x
-        if check_columns_fit(unoccupied_columns, row, offset, row_length):
-            return offset
-
-    raise ValueError("Row cannot bossily fit in %r: %r"
-                     % (list(unoccupied_columns.keys()), row))
-
+    Finds the first free column where the row's items can fit, given the
+    free columns as a list of bitmap blocks, starting from block `start`.
 
-def check_columns_fit(unoccupied_columns, row, offset, row_length):
+    >>> find_first_fit([0b1101, 0b0000], 0b11, 4)
+    2
+    >>> find_first_fit([0b1001, 0b0010, 0b0000], 0b101, 4)
+    3
     """
-    Checks if all the occupied columns in the row fit in the indices
-    given by free columns.
-
-    >>> check_columns_fit({0,1,2,3}, [(0, True), (2, True)], 0, 4)
-    True
-    >>> check_columns_fit({0,2,3}, [(2, True), (3, True)], 0, 4)
-    True
-    >>> check_columns_fit({}, [(2, True), (3, True)], 0, 4)
-    False
-    >>> check_columns_fit({0}, [(2, True)], 2, 4)
-    True
-    >>> check_columns_fit({0}, [(3, True)], 2, 4)
-    False
+    for i in range(start, len(free_blocks) - 1):
+        block = free_blocks[i]
+        if not block:
+            continue
 
-    """
-    for index, item in row:
-        adjusted_index = (index + offset) % row_length
+        # Bit x of fits is set when the row fits with its first item at
+        # column x of this block; this tests every column at once.
+        window = block | free_blocks[i + 1] << block_size
+        fits = block
+        remaining = row_mask
+        while remaining:
+            lowest = remaining & -remaining
+            fits &= window >> (lowest.bit_length() - 1)
+            remaining ^= lowest
 
-        # Check if the index is in the appropriate place.
-        if adjusted_index not in unoccupied_columns:
-            return False
+        if fits:
+            return i * block_size + (fits & -fits).bit_length() - 1
 
-    return True
+    raise ValueError("Row cannot bossily fit in %r: %s"
+                     % (free_blocks, bin(row_mask)))
 
 
 def print_square(row_queue, t):
     """
     Prints a row queue as its conceptual square array.
     """
-    occupied_rows = {y: row for _, y, row in row_queue}
+    occupied_rows = {y: row for _, y, _, row in row_queue}
 
     empty_row = ', '.join('...' for _ in range(t))
     for y in range(t):
@@ -291,6 +284,18 @@ def make_hash(keys, **kwargs):
     1
     >>> hash_parameters(l).slots[1]
     19
+
+    Keys that cannot be hashed into any slot raise a KeyError; other keys
+    outside of the original set may still be hashed to a (wrong) slot:
+
+    >>> hf(36)
+    Traceback (most recent call last):
+    ...
+    KeyError: 36
+    >>> hf(-1)
+    Traceback (most recent call last):
+    ...
+    KeyError: -1
     """
     params = hash_parameters(keys, **kwargs)
 
@@ -298,12 +303,21 @@ def make_hash(keys, **kwargs):
     r = params.r
     offset = params.offset
     to_int = params.to_int if params.to_int else __identity
+    num_rows = len(r)
+    length = len(params.slots)
 
-    def perfect_hash(x):
-        val = to_int(x) + offset
+    def perfect_hash(key):
+        val = to_int(key) + offset
         x = val % t
         y = val // t
-        return x + r[y]
+        # Rows past either end, and rows that had no items (and thus have
+        # no displacement), cannot hold the key; neither can a column that
+        # is past the last slot.
+        if 0 <= y < num_rows:
+            displacement = r[y]
+            if displacement is not None and x + displacement < length:
+                return x + displacement
+        raise KeyError(key)
 
     # Undocumented properties, but used in make_dict()...
     perfect_hash.length = len(params.slots)
@@ -311,11 +325,12 @@ def make_hash(keys, **kwargs):
     return perfect_hash
 
 
-def make_dict(name, keys, **kwargs):
+def make_dict(name, keys, typecode=None, **kwargs):
     """
     Creates a dictionary-like mapping class that uses perfect hashing.
-    ``name`` is the proper class name of the returned class. See
-    ``hash_parameters()`` for documentation on all arguments after
+    ``name`` is the proper class name of the returned class. If ``typecode``
+    is given, values are stored in an ``array.array`` of that typecode. See
+    ``hash_parameters()`` for documentation on all other arguments after
     ``name``.
 
     >>> MyDict = make_dict('MyDict', '+-<>[],.', to_int=ord)
@@ -340,7 +355,7 @@ def make_dict(name, keys, **kwargs):
         generated by `%s.%s(%r, ...)`.
         """ % (__name__, make_dict.__name__, name)
 
-    return create_dict_subclass(name, hash_func, slots, doc)
+    return create_dict_subclass(name, hash_func, slots, doc, typecode)
 
 if __name__ == '__main__':
     import doctest
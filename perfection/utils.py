@@ -4,6 +4,8 @@
 Shared utilities for perfect hash tools.
 """
 
+import array
+
 try:
     # Python 3.3+
     from collections.abc import MutableMapping
@@ -12,56 +14,104 @@ except ImportError:
     from collections import MutableMapping
 
 
-def create_dict_subclass(name, hash_func, slots, doc):
+# Marks an empty slot in a perfect hash dict. Unlike None, it can never be
+# a key.
+_MISSING = object()
+
+
+def create_dict_subclass(name, hash_func, slots, doc, typecode=None):
     """
     Creates a dict subclass named name, using the hash_function to index
     hash_length items. Doc should be any additional documentation added to the
     class.
+
+    If typecode is given, values are stored unboxed in an array.array of that
+    typecode (e.g., 'l' for integers, 'd' for floats, or 'u' for characters),
+    instead of in a list; the class then only accepts values that fit in that
+    array.
     """
 
     hash_length = len(slots)
 
-    # Returns array index -- raises a KeyError if the key does not match
-    # its slot value.
-    def index_or_key_error(key):
-        index = hash_func(key)
-        # Make sure the key is **exactly** the same.
-        if key != slots[index]:
-            raise KeyError(key)
-        return index
-
+    if typecode is None:
+        empty_values = [None] * hash_length
+        empty_value = None
+    else:
+        # All zero bytes are a valid item of any typecode: 0, 0.0 or '\0'.
+        itemsize = array.array(typecode).itemsize
+        empty_item = array.array(typecode, b'\0' * itemsize)
+        empty_values = empty_item * hash_length
+        empty_value = empty_item[0]
+
+    # Keys and values are stored in two parallel arrays, indexed by the
+    # hash of the key. An empty slot holds _MISSING in the key array.
     def init(self, *args, **kwargs):
-        self._arr = [None] * hash_length
+        self._keys = [_MISSING] * hash_length
+        self._values = empty_values[:]
         self._len = 0
 
         # Delegate initialization to update provided by MutableMapping:
         self.update(*args, **kwargs)
 
     def getitem(self, key):
-        index = index_or_key_error(key)
-        if self._arr[index] is None:
+        index = hash_func(key)
+        stored_key = self._keys[index]
+        # Make sure the key is **exactly** the same.
+        if stored_key is _MISSING or key != stored_key:
             raise KeyError(key)
-        return self._arr[index][1]
+        return self._values[index]
 
     def setitem(self, key, value):
-        index = index_or_key_error(key)
-        self._arr[index] = (key, value)
+        index = hash_func(key)
+        # Make sure the key is **exactly** the same as its slot value.
+        if key != slots[index]:
+            raise KeyError(key)
+        # Store the value first: a typed array may reject it, and then the
+        # key must not be recorded either.
+        self._values[index] = value
+        if self._keys[index] is _MISSING:
+            self._len += 1
+        self._keys[index] = key
+
+    # MutableMapping implements these two in terms of __getitem__, raising
+    # and catching a KeyError for every miss; look in the slot directly.
+    # The hash function raises KeyError for keys it cannot hash to any slot.
+    def contains(self, key):
+        try:
+            stored_key = self._keys[hash_func(key)]
+        except KeyError:
+            return False
+        return stored_key is not _MISSING and key == stored_key
+
+    def get(self, key, default=None):
+        try:
+            index = hash_func(key)
+        except KeyError:
+            return default
+        stored_key = self._keys[index]
+        if stored_key is _MISSING or key != stored_key:
+            return default
+        return self._values[index]
 
     def delitem(self, key):
-        index = index_or_key_error(key)
-        if self._arr[index] is None:
+        index = hash_func(key)
+        stored_key = self._keys[index]
+        if stored_key is _MISSING or key != stored_key:
             raise KeyError(key)
-        self._arr[index] = None
+        self._keys[index] = _MISSING
+        self._values[index] = empty_value
+        self._len -= 1
 
     def dict_iter(self):
-        return (pair[0] for pair in self._arr if pair is not None)
+        return (key for key in self._keys if key is not _MISSING)
 
     def dict_len(self):
-        # TODO: Make this O(1) using auxiliary state?
-        return sum(1 for _ in self)
+        return self._len
 
     def dict_repr(self):
-        arr_repr = (repr(pair) for pair in self._arr if pair is not None)
+        arr_repr = (repr((key, value))
+                    for key, value in zip(self._keys, self._values)
+                    if key is not _MISSING)
         return "".join((name, "([", ", ".join(arr_repr), "])"))
 
     # Inheriting from MutableMapping gives us a whole whackload of methods for
@@ -77,6 +127,8 @@ def create_dict_subclass(name, hash_func, slots, doc):
             "__getitem__": getitem,
             "__setitem__": setitem,
             "__delitem__": delitem,
+            "__contains__": contains,
+            "get": get,
             "__iter__": dict_iter,
             "__len__": dict_len,
             "__repr__": dict_repr,
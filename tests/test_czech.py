@@ -1,9 +1,12 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
 
+import random
 from math import ceil
+from string import ascii_lowercase
 
-from perfection.czech import CzechHashBuilder
+from perfection.czech import CzechHashBuilder, make_hash
+from perfection.forest import ForestGraph
 
 def test_guarantees():
     duplicated_input = 'guacala'
@@ -11,3 +14,31 @@ def test_guarantees():
     info = CzechHashBuilder(duplicated_input)
     assert 2 * unique_len <= info.n <= 3 * unique_len
     assert info.trials_taken <= ceil(info.n ** 0.5)
+
+
+def test_assign_long_path():
+    # A path much longer than the recursion limit.
+    length = 5000
+    edges = [(v, v + 1) for v in range(length)]
+
+    builder = CzechHashBuilder.__new__(CzechHashBuilder)
+    builder.n = length + 1
+    builder.graph = ForestGraph(edges=edges)
+    builder.edge_numbers = {}
+    for num, (u, v) in enumerate(edges):
+        builder.edge_numbers[u, v] = builder.edge_numbers[v, u] = num
+    builder.assign()
+
+    assert all(builder.g[u] + builder.g[v] == num
+               for num, (u, v) in enumerate(edges))
+
+
+def test_very_long_word():
+    # Too long to be hashed by a specialized function.
+    r = random.Random(1)
+    words = list(set(''.join(r.choice(ascii_lowercase) for _ in range(8))
+                     for _ in range(2000)))
+    words.append('q' * 5000)
+
+    hf = make_hash(words)
+    assert sorted(map(hf, words)) == list(range(len(words)))
@@ -15,3 +15,33 @@ def test_invariants():
 
     with pytest.raises(InvariantError):
         graph += (5, 5)
+
+
+def test_components():
+    graph = ForestGraph(edges=[(1, 2), (3, 4), (5, 6), (2, 3)])
+
+    components = graph.components
+    assert components[1] == {1, 2, 3, 4}
+    assert components[1] is components[4]
+    assert components[5] == {5, 6}
+
+    with pytest.raises(InvariantError):
+        graph += (4, 1)
+
+    graph += (6, 1)
+    assert graph.components[5] == {1, 2, 3, 4, 5, 6}
+
+
+def test_from_edges_bulk():
+    edges = [(1, 2), (3, 4), (5, 6), (2, 3)]
+    graph = ForestGraph.from_edges_bulk(edges)
+    assert graph.edges == ForestGraph(edges=edges).edges
+    components = graph.components
+    assert components[1] == {1, 2, 3, 4}
+    assert components[1] is components[4]
+
+    with pytest.raises(InvariantError):
+        ForestGraph.from_edges_bulk(edges + [(4, 1)])
+
+    with pytest.raises(InvariantError):
+        ForestGraph.from_edges_bulk([(5, 5)])
@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import random
+
+from perfection.getty import (hash_parameters, make_hash,
+                              place_items_in_square)
+
+
+def test_wide_rows():
+    # Rows much wider than a machine word.
+    keys = random.Random(42).sample(range(100000), 500)
+    params = hash_parameters(keys)
+    assert params.t > 64
+
+    hf = make_hash(keys)
+    assert all(params.slots[hf(key)] == key for key in keys)
+
+
+def test_rows_longest_first():
+    # Filtering the empty rows out of a heapified list of rows used to break
+    # the heap, so that row 1 (one item) was placed before row 5 (two
+    # items).
+    items = [1, 5, 15, 19, 20, 31, 41, 47, 49, 63]
+    rows = place_items_in_square(items, 8)
+    assert [y for _, y, _, _ in rows] == [0, 2, 5, 1, 3, 6, 7]
+    assert [len(row) for _, _, _, row in rows] == [2, 2, 2, 1, 1, 1, 1]
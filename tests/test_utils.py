@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+from string import printable
+
+import pytest
+
+from perfection import czech, make_dict
+
+
+def test_len():
+    Brainfuck = make_dict('Brainfuck', '+-<>[],.', to_int=ord)
+    d = Brainfuck({'+': 1})
+    assert len(d) == 1
+
+    # Overwriting an existing key does not change the length.
+    d['+'] = 2
+    d['-'] = 3
+    assert len(d) == 2
+
+    del d['+']
+    assert len(d) == 1
+
+    d.clear()
+    assert len(d) == 0
+
+
+def test_typecode():
+    Brainfuck = make_dict('Brainfuck', '+-<>[],.', to_int=ord, typecode='l')
+    d = Brainfuck({'+': 1, '.': -2})
+    assert d['+'] == 1
+    assert d['.'] == -2
+    assert dict(d) == {'+': 1, '.': -2}
+
+    del d['+']
+    assert '+' not in d
+    assert len(d) == 1
+
+    # A value the array rejects must leave the dict unchanged.
+    with pytest.raises(TypeError):
+        d['-'] = 'not an int'
+    assert '-' not in d
+    assert len(d) == 1
+
+    with pytest.raises(OverflowError):
+        d['<'] = 2 ** 70
+    assert '<' not in d
+    assert len(d) == 1
+
+
+def test_contains_and_get():
+    Brainfuck = make_dict('Brainfuck', '+-<>[],.', to_int=ord)
+    d = Brainfuck({'+': 1})
+    assert '+' in d
+    assert '-' not in d
+    assert d.get('+') == 1
+    assert d.get('-') is None
+    assert d.get('-', 0) == 0
+
+    # Every other key is a miss, whether or not it hashes to a slot.
+    for key in printable:
+        if key == '+':
+            continue
+        assert key not in d
+        assert d.get(key) is None
+        with pytest.raises(KeyError):
+            d[key]
+
+    # Keys the hash function cannot handle at all are still an error.
+    with pytest.raises(TypeError):
+        5 in d
+
+
+def test_czech_contains():
+    months = 'jan feb mar apr may jun jul aug sep oct nov dec'.split()
+    Months = czech.make_dict('Months', months)
+    d = Months(jan=1)
+    assert 'jan' in d
+    for key in months[1:] + list(printable):
+        assert key not in d
+        assert d.get(key) is None
+        with pytest.raises(KeyError):
+            d[key]
+
+
+def test_non_integer_typecodes():
+    for typecode, value in (('d', 0.5), ('u', u'x')):
+        Brainfuck = make_dict('Brainfuck', '+-<>[],.', to_int=ord,
+                              typecode=typecode)
+        d = Brainfuck({'+': value, '-': value})
+        assert d['+'] == value
+        del d['-']
+        assert dict(d) == {'+': value}